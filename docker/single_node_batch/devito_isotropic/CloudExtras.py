@@ -1,19 +1,24 @@
 import numpy as np
 import boto3
 import segyio
-import subprocess
 import os
+import io
+from boto3.s3.transfer import TransferConfig
 from scipy import interpolate
 from devito import Eq, Operator
 
 client = boto3.client('s3')
 
+# Transfer large objects in concurrent 64 MB parts
+transfer_config = TransferConfig(multipart_threshold=64*1024*1024,
+    multipart_chunksize=64*1024*1024, use_threads=True)
+
 ####################################################################################################
 # array put and get
 
 # write array
 def array_put(body, bucket, key):
-    client.put_object(Body=body.tostring(), Bucket=bucket, Key=key)
+    client.upload_fileobj(io.BytesIO(body.tobytes()), bucket, key, Config=transfer_config)
     client.put_object_tagging(Bucket=bucket, Key=key, \
         Tagging={'TagSet':[{'Key':'eltype','Value':'float32'}, \
         {'Key':'creator','Value':'S3-SLIM'}, \
@@ -28,7 +33,7 @@ def array_get(bucket, key):
             if tag['Key'] == 'eltype':
                 dtype=tag['Value']
         string = binary['Body'].read()
-        x = np.fromstring(string, dtype=dtype)
+        x = np.frombuffer(string, dtype=dtype)
         return x
     except:
         raise Exception('could not retrieve array')
@@ -69,7 +74,7 @@ def convert_float_from_string(s):
 # write model
 def model_put(model, origin, spacing, bucket, key):
     shape = model.shape
-    client.put_object(Body=model.tostring(), Bucket=bucket, Key=key)
+    client.upload_fileobj(io.BytesIO(model.tobytes()), bucket, key, Config=transfer_config)
     shape_str = convert_to_string(shape)
     origin_str = convert_to_string(origin)
     spacing_str = convert_to_string(spacing)
@@ -95,7 +100,7 @@ def model_get(bucket, key):
         elif tag['Key'] == 'shape':
             shape = convert_int_from_string(tag['Value'])
     string = binary['Body'].read()
-    m = np.fromstring(string, dtype=dtype)
+    m = np.frombuffer(string, dtype=dtype)
     return m.reshape(shape), origin, spacing
 
 ####################################################################################################
@@ -103,11 +108,11 @@ def model_get(bucket, key):
 
 def segy_get(bucket, path, filename, ndims=2, keepFile=False):
     # copy from s3 to local volume
-    subprocess.run(['aws', 's3', 'cp', 's3://' + bucket + '/' + path + filename, '.'])
+    client.download_file(bucket, path + filename, filename, Config=transfer_config)
     argout = segy_read(filename, ndims=ndims)
 
     if keepFile is False:
-        subprocess.run(['rm', '-f', filename])
+        os.remove(filename)
 
     return argout
 
@@ -147,13 +152,9 @@ def segy_read(filename, ndims=2):
         elif elevScalar > 0.:
             groupZ = groupZ * np.abs(elevScalar)
 
-        nrec = len(groupX)
-        nt = len(segyfile.trace[0])
-
-        # Extract data
-        data = np.zeros(shape=(nt, nrec), dtype='float32')
-        for i in range(nrec):
-            data[:,i] = segyfile.trace[i]
+        # Extract data, reading all traces at once
+        data = np.ascontiguousarray(segyfile.trace.raw[:].T, dtype='float32')
+        nt = data.shape[0]
         tmax = (nt-1)*dt
 
     if ndims == 2:
@@ -179,13 +180,8 @@ def segy_model_read(filename):
         elif coordScalar > 0.:
             sourceX = sourceX * np.abs(coordScalar)
 
-        nx = len(sourceX)
-        nz = len(segyfile.trace[0])
-
-        # Extract data
-        data = np.zeros(shape=(nx, nz), dtype='float32')
-        for i in range(nx):
-            data[i,:] = segyfile.trace[i]
+        # Extract data, reading all traces at once
+        data = np.asarray(segyfile.trace.raw[:], dtype='float32')
 
         return data, sourceX, dx
 
@@ -196,11 +192,9 @@ def segy_put(data, sourceX, sourceZ, groupX, groupZ, dt, bucket, path, filename,
     segy_write(data, sourceX, sourceZ, groupX, groupZ, dt, filename, sourceY=None, groupY=None, elevScalar=-1000, coordScalar=-1000)
 
     # copy from s3 to local volume
-    status = subprocess.run(['aws', 's3', 'cp', filename, 's3://' + bucket + '/' + path + filename])
+    client.upload_file(filename, bucket, path + filename, Config=transfer_config)
     if keepFile is False:
-        subprocess.run(['rm', '-f', filename])
-
-    return status
+        os.remove(filename)
 
 
 def segy_write(data, sourceX, sourceZ, groupX, groupZ, dt, filename, sourceY=None, groupY=None, elevScalar=-1000, coordScalar=-1000):
@@ -221,24 +215,39 @@ def segy_write(data, sourceX, sourceZ, groupX, groupZ, dt, filename, sourceY=Non
     spec.format=1
     spec.sorting=1
 
+    # Header fields shared by all traces
+    common_header = {
+        segyio.su.fldr : 1,
+        segyio.su.sx : int(np.round(sourceX[0] * np.abs(coordScalar))),
+        segyio.su.sy : int(np.round(sourceY[0] * np.abs(coordScalar))),
+        segyio.su.selev: int(np.round(sourceZ[0] * np.abs(elevScalar))),
+        segyio.su.dt : int(dt*1e3),
+        segyio.su.scalel : int(elevScalar),
+        segyio.su.scalco : int(coordScalar)
+    }
+
+    # Scaled receiver coordinates of all traces, in double precision as for
+    # the scalar products of a single trace
+    gx = np.round(np.asarray(groupX, dtype='float64') * abs(coordScalar)).astype('int64').tolist()
+    gy = np.round(np.asarray(groupY, dtype='float64') * abs(coordScalar)).astype('int64').tolist()
+    gelev = np.round(np.asarray(groupZ, dtype='float64') * abs(elevScalar)).astype('int64').tolist()
+
+    # One contiguous row per trace
+    traces = np.ascontiguousarray(data.T, dtype='float32')
+
     with segyio.create(filename, spec) as segyfile:
         for i in range(nxrec):
-            segyfile.header[i] = {
+            header = common_header.copy()
+            header.update({
                 segyio.su.tracl : i+1,
                 segyio.su.tracr : i+1,
-                segyio.su.fldr : 1,
                 segyio.su.tracf : i+1,
-                segyio.su.sx : int(np.round(sourceX[0] * np.abs(coordScalar))),
-                segyio.su.sy : int(np.round(sourceY[0] * np.abs(coordScalar))),
-                segyio.su.selev: int(np.round(sourceZ[0] * np.abs(elevScalar))),
-                segyio.su.gx : int(np.round(groupX[i] * np.abs(coordScalar))),
-                segyio.su.gy : int(np.round(groupY[i] * np.abs(coordScalar))),
-                segyio.su.gelev : int(np.round(groupZ[i] * np.abs(elevScalar))),
-                segyio.su.dt : int(dt*1e3),
-                segyio.su.scalel : int(elevScalar),
-                segyio.su.scalco : int(coordScalar)
-            }
-            segyfile.trace[i] = data[:, i]
+                segyio.su.gx : gx[i],
+                segyio.su.gy : gy[i],
+                segyio.su.gelev : gelev[i]
+            })
+            segyfile.header[i] = header
+        segyfile.trace[:] = traces
         segyfile.dt=int(dt*1e3)
 
 
@@ -266,14 +275,12 @@ def create_3D_grid(xrec, yrec, zrec):
     nyrec = len(yrec)
     nrec_total = nxrec * nyrec
 
-    rec = np.zeros(shape=(nrec_total, 3), dtype='float32')
-    count = 0
-    for j in range(nxrec):
-        for k in range(nyrec):
-            rec[count, 0] = xrec[j]
-            rec[count, 1] = yrec[k]
-            rec[count, 2] = zrec
-            count += 1
+    # x varies slowest, y fastest
+    XX, YY = np.meshgrid(xrec, yrec, indexing='ij')
+    rec = np.empty(shape=(nrec_total, 3), dtype='float32')
+    rec[:, 0] = XX.ravel()
+    rec[:, 1] = YY.ravel()
+    rec[:, 2] = zrec
     return rec
 
 
@@ -289,20 +296,20 @@ def restrict_model_to_receiver_grid(sx, gx, m, spacing, origin, sy=None, gy=None
             (shape[2] - 1) * spacing[2])
 
     # Scan for minimum/maximum source/receiver coordinates
-    min_x = np.min([np.min(sx), np.min(gx)])
-    max_x = np.max([np.max(sx), np.max(gx)])
+    min_x = min(np.min(sx), np.min(gx))
+    max_x = max(np.max(sx), np.max(gx))
     if sy is not None and gy is not None:
-        min_y = np.min([np.min(sy), np.min(gy)])
-        max_y = np.max([np.max(sy), np.max(gy)])
+        min_y = min(np.min(sy), np.min(gy))
+        max_y = max(np.max(sy), np.max(gy))
 
     # Add buffer zone if possible
-    min_x = np.max([origin[0], min_x - buffer_size])
-    max_x = np.min([origin[0] + domain_size[0], max_x + buffer_size])
+    min_x = max(origin[0], min_x - buffer_size)
+    max_x = min(origin[0] + domain_size[0], max_x + buffer_size)
     #print("min_x: ", min_x)
     #print("max_x: ", max_x)
     if ndim == 3:
-        min_y = np.max([origin[1], min_y - buffer_size])
-        max_y = np.min([origin[1] + domain_size[1], max_y + buffer_size])
+        min_y = max(origin[1], min_y - buffer_size)
+        max_y = min(origin[1] + domain_size[1], max_y + buffer_size)
         #print("min_y: ", min_y)
         #print("max_y: ", max_y)
 
@@ -337,30 +344,21 @@ def restrict_model_to_receiver_grid(sx, gx, m, spacing, origin, sy=None, gy=None
 
 def extent_gradient(shape_full, origin_full, shape_sub, origin_sub, spacing, g):
 
-    nz = shape_full[-1]
     ndim = len(shape_full)
 
     nx_left = int((origin_sub[0] - origin_full[0]) / spacing[0])
-    nx_right = shape_full[0] - shape_sub[0] - nx_left
 
     if ndim == 3:
         ny_left = int((origin_sub[1] - origin_full[1]) / spacing[1])
-        ny_right = shape_full[1] - shape_sub[1] - ny_left
 
+    # Zero outside of the sub-domain
+    g_full = np.zeros(shape=shape_full, dtype='float32')
     if ndim == 2:
-        block1 = np.zeros(shape=(nx_left, nz), dtype='float32')
-        block2 = np.zeros(shape=(nx_right, nz), dtype='float32')
-        g = np.concatenate((block1, g, block2), axis=0)
+        g_full[nx_left:nx_left + shape_sub[0], :] = g
     else:
-        block1 = np.zeros(shape=(nx_left, shape_sub[1], nz), dtype='float32')
-        block2 = np.zeros(shape=(nx_right, shape_sub[1], nz), dtype='float32')
-        g = np.concatenate((block1, g, block2), axis=0)
-        del block1, block2
-        block3 = np.zeros(shape=(shape_full[0], ny_left, nz), dtype='float32')
-        block4 = np.zeros(shape=(shape_full[0], ny_right, nz), dtype='float32')
-        g = np.concatenate((block3, g, block4), axis=1)
+        g_full[nx_left:nx_left + shape_sub[0], ny_left:ny_left + shape_sub[1], :] = g
 
-    return g
+    return g_full
 
 
 ####################################################################################################
@@ -372,10 +370,10 @@ def resample(data, t0, tn, nt_prev, nt_new):
     time_prev = np.linspace(start=t0, stop=tn, num=nt_prev)
     time_new = np.linspace(start=t0, stop=tn, num=nt_new)
 
-    d_resamp = np.zeros(shape=(len(time_new), data.shape[1]), dtype='float32')
-    for i in range(data.shape[1]):
-        tck = interpolate.splrep(time_prev, data[:, i], k=3)
-        d_resamp[:, i] = interpolate.splev(time_new, tck)
+    # Interpolating cubic spline of all traces at once (not-a-knot end
+    # conditions, as splrep with k=3 and no smoothing)
+    spline = interpolate.CubicSpline(time_prev, data, axis=0, bc_type='not-a-knot')
+    d_resamp = spline(time_new).astype('float32')
     return d_resamp
 
 
@@ -400,12 +398,8 @@ def image_mute(x, mute):
 
 
 def image_scaling(x, model):
-    filter = np.arange(start=0, stop=(model.shape[1])*model.spacing[1], step=model.spacing[1])
-    filter = np.sqrt(filter)
-    x_scale = np.zeros(model.shape, dtype='float32')
-    for j in range(model.shape[0]):
-        x_scale[j, :] = x[j, :] * filter
-    return x_scale
+    filter = np.sqrt(np.arange(model.shape[1]) * model.spacing[1])
+    return (x * filter).astype('float32', copy=False)
 
 
 def data_mute(dobs, rec_coordinates, tn, dt, mute_start=1, mute_all=None):
@@ -423,13 +417,13 @@ def data_mute(dobs, rec_coordinates, tn, dt, mute_start=1, mute_all=None):
     dy = ymax - y0
     slope = dy / dx
 
-    mask = np.ones((nt, nrec), dtype='float32')
+    # Mute all samples above the direct wave of each receiver
+    idx = (ymax - slope*np.arange(nrec)).astype('int')
+    # Negative indices count from the end of the trace, as in slicing
+    idx = np.where(idx < 0, nt + idx, idx)
+    mask = (np.arange(nt)[:, None] >= idx[None, :]).astype('float32')
     mask[0:y0, :] = 0.0
     if mute_all is not None:
         mask[0:mute_all, :] = 0.0
 
-    for j in range(nrec):
-        idx = int(ymax - slope*j)
-        mask[0:idx, j] = 0
-
     return dobs.data * mask
@@ -26,8 +26,7 @@ zmax = (shape[1]-1)*spacing/1e3
 
 # Linear depth scaling
 filter = np.linspace(start=0, stop=1, num=x.shape[1])
-for j in range(x.shape[0]):
-    x[j, :] = x[j, :] * filter
+x = x * filter
 
 # High pass filter to remove low frequency artifacts
 xlow = ndimage.gaussian_filter(x, 8)
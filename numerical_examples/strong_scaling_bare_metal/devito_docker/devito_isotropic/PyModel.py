@@ -30,30 +30,35 @@ def initialize_damp(damp, nbpml, spacing, mask=False):
     """
 
     phy_shape = damp.grid.subdomains['phydomain'].shape
-    data = np.ones(phy_shape) if mask else np.zeros(phy_shape)
-
-    pad_widths = [(nbpml, nbpml) for i in range(damp.ndim)]
-    data = np.pad(data, pad_widths, 'edge')
+    # The field is constant before the layers are added, so it is allocated
+    # directly with the PML included rather than padded
+    full_shape = tuple(s + 2*nbpml for s in phy_shape)
+    data = np.full(full_shape, 1.0 if mask else 0.0)
 
     dampcoeff = 1.5 * np.log(1.0 / 0.001) / (40.)
 
     assert all(damp._offset_domain[0] == i for i in damp._offset_domain)
 
+    # Dampening coefficient of every layer j
+    pos = np.abs((nbpml - np.arange(nbpml) + 1) / float(nbpml))
+    val = dampcoeff * (pos - np.sin(2*np.pi*pos)/(2*np.pi))
+    if mask:
+        val = -val
+
+    # Broadcast the per-layer coefficients along the remaining dimensions
+    bcast = (slice(None),) + (None,) * (damp.ndim - 1)
+
     for i in range(damp.ndim):
-        for j in range(nbpml):
-            # Dampening coefficient
-            pos = np.abs((nbpml - j + 1) / float(nbpml))
-            val = dampcoeff * (pos - np.sin(2*np.pi*pos)/(2*np.pi))
-            if mask:
-                val = -val
-            # : slices
-            all_ind = [slice(0, d) for d in data.shape]
-            # Left slice for dampening for dimension i
-            all_ind[i] = slice(j, j+1)
-            data[tuple(all_ind)] += val/spacing[i]
-            # right slice for dampening for dimension i
-            all_ind[i] = slice(data.shape[i]-j, data.shape[i]-j+1)
-            data[tuple(all_ind)] += val/spacing[i]
+        # Profile of dimension i, shared by both sides
+        profile = (val/spacing[i])[bcast]
+        # Writeable view with dimension i first
+        view = np.moveaxis(data, i, 0)
+        n = view.shape[0]
+        # Left slab for dampening for dimension i
+        view[:nbpml] += profile
+        # Right slab for dampening for dimension i, layer j sits at n - j
+        # (index n of layer 0 is past the end and is skipped)
+        view[n-nbpml+1:] += profile[:0:-1]
 
     initialize_function(damp, data, 0)
 
@@ -69,8 +74,40 @@ def initialize_function(function, data, nbpml, pad_mode='edge'):
                      :func:`numpy.pad`.
     """
     pad_widths = [(nbpml + i.left, nbpml + i.right) for i in function._size_halo]
-    data = np.pad(data, pad_widths, pad_mode)
-    function.data_with_halo[:] = data
+    if all(l == 0 and r == 0 for l, r in pad_widths):
+        # Nothing to pad, copy straight into the Function
+        function.data_with_halo[:] = data
+    elif pad_mode in ('edge', 'constant'):
+        function.data_with_halo[:] = _pad(data, pad_widths, pad_mode)
+    else:
+        function.data_with_halo[:] = np.pad(data, pad_widths, pad_mode)
+
+
+def _pad(data, pad_widths, pad_mode):
+    """Equivalent to ``np.pad(data, pad_widths, pad_mode)`` for the 'edge' and
+    (zero) 'constant' modes, but writes into a single pre-allocated array
+    rather than concatenating along each axis.
+    :param data: The array to be padded.
+    :param pad_widths: Number of (left, right) points to add per dimension.
+    :param pad_mode: Either 'edge' or 'constant'.
+    """
+    data = np.asarray(data)
+    shape = tuple(s + l + r for s, (l, r) in zip(data.shape, pad_widths))
+    if pad_mode == 'constant':
+        padded = np.zeros(shape, dtype=data.dtype)
+    else:
+        padded = np.empty(shape, dtype=data.dtype)
+    padded[tuple(slice(l, l + s) for s, (l, _) in zip(data.shape, pad_widths))] = data
+
+    if pad_mode == 'edge':
+        # Replicate the edges one dimension at a time, so that the corners are
+        # filled from the already padded faces of the previous dimensions
+        for i, (l, r) in enumerate(pad_widths):
+            view = np.moveaxis(padded, i, 0)
+            n = view.shape[0]
+            view[:l] = view[l:l+1]
+            view[n-r:] = view[n-r-1:n-r]
+    return padded
 
 class Model(object):
     """The physical model used in seismic inversion processes.
@@ -90,15 +127,15 @@ class Model(object):
 
         self.shape = shape
         self.nbpml = int(nbpml)
-        self.origin = tuple([dtype(o) for o in origin])
-        self._is_tti = False
+        self.origin = tuple(np.asarray(origin, dtype=dtype))
+        spacing_array = np.array(spacing)
         # Origin of the computational domain with PML to inject/interpolate
         # at the correct index
-        origin_pml = tuple([dtype(o - s*nbpml) for o, s in zip(origin, spacing)])
+        origin_pml = tuple((np.array(origin) - spacing_array * nbpml).astype(dtype))
         phydomain = PhysicalDomain(self.nbpml)
         shape_pml = np.array(shape) + 2 * self.nbpml
         # Physical extent is calculated per cell, so shape - 1
-        extent = tuple(np.array(spacing) * (shape_pml - 1))
+        extent = tuple(spacing_array * (shape_pml - 1))
         self.grid = Grid(extent=extent, shape=shape_pml, origin=origin_pml, dtype=dtype,
                          subdomains=phydomain, dimensions=in_dim)
 
@@ -108,11 +145,7 @@ class Model(object):
         else:
             self.m = 1/vp**2
 
-        if isinstance(rho, np.ndarray):
-            self.rho = Function(name="rho", grid=self.grid, space_order=space_order)
-            initialize_function(self.rho, rho, self.nbpml)
-        else:
-            self.rho = rho
+        self.rho = self._gen_phys_param(rho, 'rho', space_order)
 
         # Set model velocity, which will also set `m`
         self.vp = vp
@@ -130,50 +163,33 @@ class Model(object):
         else:
             self.dm = 1
 
-        if epsilon is not None:
-            self._is_tti = True
-            if isinstance(epsilon, np.ndarray):
-                self.epsilon = Function(name="epsilon", grid=self.grid, space_order=space_order)
-                initialize_function(self.epsilon, 1 + 2 * epsilon, self.nbpml)
-                # Maximum velocity is scale*max(vp) if epsilon > 0
-                if np.max(self.epsilon.data) > 0:
-                    self.scale = np.sqrt(np.max(self.epsilon.data))
-            else:
-                self.epsilon = 1 + 2 * epsilon
-                self.scale = np.sqrt(self.epsilon)
-        else:
-            self.epsilon = 1.0
-            self.scale = 1.0
-
-        if delta is not None:
-            self._is_tti = True
-            if isinstance(delta, np.ndarray):
-                self.delta = Function(name="delta", grid=self.grid, space_order=space_order)
-                initialize_function(self.delta, np.sqrt(1 + 2 * delta), self.nbpml)
-            else:
-                self.delta = np.sqrt(1 + 2 * delta)
-        else:
-            self.delta = 1.0
-
-        if theta is not None:
-            self._is_tti = True
-            if isinstance(theta, np.ndarray):
-                self.theta = Function(name="theta", grid=self.grid, space_order=space_order)
-                initialize_function(self.theta, theta, self.nbpml)
-            else:
-                self.theta = theta
-        else:
-            self.theta = 0.0
-
-        if phi is not None:
-            self._is_tti = True
-            if isinstance(phi, np.ndarray):
-                self.phi = Function(name="phi", grid=self.grid, space_order=space_order)
-                initialize_function(self.phi, phi, self.nbpml)
-            else:
-                self.phi = phi
-        else:
-            self.phi = 0.0
+        self._is_tti = any(p is not None for p in [epsilon, delta, theta, phi])
+        self.epsilon = self._gen_phys_param(None if epsilon is None else 1 + 2 * epsilon,
+                                            'epsilon', space_order, default_value=1.0)
+        if isinstance(epsilon, np.ndarray):
+            # Maximum velocity is scale*max(vp) if epsilon > 0
+            max_epsilon = np.max(self.epsilon.data)
+            if max_epsilon > 0:
+                self.scale = np.sqrt(max_epsilon)
+        elif epsilon is not None:
+            self.scale = np.sqrt(self.epsilon)
+        self.delta = self._gen_phys_param(None if delta is None else np.sqrt(1 + 2 * delta),
+                                          'delta', space_order, default_value=1.0)
+        self.theta = self._gen_phys_param(theta, 'theta', space_order, default_value=0.0)
+        self.phi = self._gen_phys_param(phi, 'phi', space_order, default_value=0.0)
+
+    def _gen_phys_param(self, field, name, space_order, default_value=None):
+        """Create a :class:`Function` named ``name`` initialised with ``field``
+        if it is an array, otherwise return ``field`` as a constant parameter
+        (or ``default_value`` if ``field`` is None).
+        """
+        if field is None:
+            return default_value
+        if isinstance(field, np.ndarray):
+            function = Function(name=name, grid=self.grid, space_order=space_order)
+            initialize_function(function, field, self.nbpml)
+            return function
+        return field
 
 
     @property
@@ -230,7 +246,7 @@ class Model(object):
         # The CFL condtion is then given by
         # dt <= coeff * h / (max(velocity))
         coeff = 0.38 if len(self.shape) == 3 else 0.42
-        dt = self.dtype(coeff * np.min(self.spacing) / (self.scale*np.max(self.vp)))
+        dt = self.dtype(coeff * min(self.spacing) / (self.scale*np.max(self.vp)))
         return self.dtype(.001 * int(1000 * dt))
 
     @property